@@ -12,47 +12,281 @@ Requirements:
 4. Posts events to relay for validation
 
 Dependencies:
-- tle (tlock encryption): go install github.com/drand/tlock/cmd/tle@latest  
+- tle (tlock encryption): go install github.com/drand/tlock/cmd/tle@latest
 - nak (nostr events): go install github.com/fiatjaf/nak@latest
-- python packages: websocket-client requests
+  (only needed as fallback when coincurve is unavailable, or with USE_NAK=1)
+- python packages: websocket-client requests coincurve
 """
 
+import asyncio
+import hmac
 import json
+import os
 import time
 import secrets
+import shutil
 import subprocess
+import threading
 import websocket
 import requests
+from requests.adapters import HTTPAdapter
 import hashlib
 import sys
+from dataclasses import dataclass
 from datetime import datetime
 
+# In-process crypto (schnorr signing, ECDH, NIP-44 v2) avoids a
+# fork+exec+Go-runtime-start per operation.  Set USE_NAK=1 to force the
+# nak subprocess path for parity testing.
+try:
+    import coincurve
+    from cryptography.hazmat.primitives.ciphers import Cipher
+    from cryptography.hazmat.primitives.ciphers.algorithms import ChaCha20
+    HAVE_NATIVE_CRYPTO = True
+except ImportError:
+    HAVE_NATIVE_CRYPTO = False
+
+# orjson serializes straight to compact UTF-8 bytes in C; the NIP-01
+# event-ID hash and the relay wire frames sit on that path
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# SIMD-accelerated base64 when available (drop-in stdlib API); the
+# tlock blobs are the largest payloads that pass through it
+try:
+    import pybase64 as base64
+except ImportError:
+    import base64
+
+# SHA-256 constructor bound once for the event-ID path.  The OpenSSL
+# backend dispatches to SHA-NI / ARMv8 SHA instructions where the CPU
+# has them; hashlib.sha256 normally resolves to it already, but pinning
+# it here skips the per-call name lookup and guarantees the backend.
+try:
+    from _hashlib import openssl_sha256 as _sha256
+except ImportError:
+    _sha256 = hashlib.sha256
+
+
+def _json_dumps(obj):
+    """Compact JSON as UTF-8 bytes (orjson when available)"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def _hkdf_extract(salt, ikm):
+    """HKDF-Extract (RFC 5869) with SHA-256"""
+    return hmac.new(salt, ikm, hashlib.sha256).digest()
+
+
+def _hkdf_expand(prk, info, length):
+    """HKDF-Expand (RFC 5869) with SHA-256"""
+    okm = b""
+    block = b""
+    counter = 1
+    while len(okm) < length:
+        block = hmac.new(prk, block + info + bytes([counter]), hashlib.sha256).digest()
+        okm += block
+        counter += 1
+    return okm[:length]
+
+
+def _nip44_padded_len(unpadded_len):
+    """Padded plaintext length per the NIP-44 v2 padding scheme"""
+    if unpadded_len <= 32:
+        return 32
+    next_power = 1 << (unpadded_len - 1).bit_length()
+    chunk = 32 if next_power <= 256 else next_power // 8
+    return chunk * ((unpadded_len - 1) // chunk + 1)
+
+
+@dataclass(slots=True)
+class Event:
+    """Nostr event under construction.
+
+    Fixed slots instead of a dict: field access skips string hashing and
+    the layout stays compact when events are built in bulk.  Conversion
+    to the wire-format dict happens once, at the sign/serialize boundary.
+    """
+    kind: int
+    content: str
+    tags: list
+    created_at: int
+    pubkey: str
+    id: str = None
+    sig: str = None
+
+    def to_dict(self):
+        """Wire-format dict (id/sig included only once set)"""
+        event = {
+            "kind": self.kind,
+            "content": self.content,
+            "tags": self.tags,
+            "created_at": self.created_at,
+            "pubkey": self.pubkey
+        }
+        if self.id is not None:
+            event["id"] = self.id
+        if self.sig is not None:
+            event["sig"] = self.sig
+        return event
+
+
+class _ToolRunner:
+    """Reusable runner for an external CLI tool (tle/nak).
+
+    Neither tle nor nak offers a REPL/batch mode, so each operation still
+    needs its own process.  What we can amortize is everything around the
+    spawn: the executable path is resolved once (no PATH search per call)
+    and all invocations go through a single helper with shared error
+    handling.  Invocations themselves run unserialized - each gets its
+    own private pipes and Popen is thread-safe, so concurrent capsule
+    builds can overlap their tle runs.
+    """
+
+    def __init__(self, tool):
+        self.tool = tool
+        self._path = None
+        self._path_lock = threading.Lock()
+
+    @property
+    def path(self):
+        """Resolved executable path, looked up lazily and cached"""
+        if self._path is None:
+            with self._path_lock:
+                if self._path is None:
+                    self._path = shutil.which(self.tool)
+                    if self._path is None:
+                        raise RuntimeError(f"{self.tool} not found in PATH")
+        return self._path
+
+    # CPython only takes the posix_spawn fast path (no fork page-table
+    # copy) when the executable path is absolute - which self.path is -
+    # and preexec_fn/pass_fds/cwd/close_fds are all left off.  Python
+    # opens its fds with O_CLOEXEC anyway, so close_fds=False is safe
+    # here and is what unlocks posix_spawn on 3.8-3.12.
+    _SPAWN_KWARGS = {"close_fds": False}
+
+    def run(self, args, input=None, text=False, timeout=10):
+        """Run the tool with args, returning the CompletedProcess"""
+        return subprocess.run(
+            [self.path] + args,
+            input=input, capture_output=True, text=text, timeout=timeout,
+            **self._SPAWN_KWARGS
+        )
+
+    def run_bytes(self, args, input_bytes, timeout=30):
+        """Stream bytes through the tool over an explicit pipe pair.
+
+        The binary tlock path shuttles ciphertext blobs; Popen.communicate
+        on raw bytes avoids subprocess.run's CompletedProcess/text plumbing
+        and keeps stdin/stdout as straight byte pipes.  Returns
+        (returncode, stdout, stderr).
+        """
+        proc = subprocess.Popen(
+            [self.path] + args,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            **self._SPAWN_KWARGS
+        )
+        try:
+            stdout, stderr = proc.communicate(input_bytes, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            # communicate doesn't reap the child on timeout; kill it so a
+            # stalled tool doesn't leak a process and its pipes
+            proc.kill()
+            proc.communicate()
+            raise
+        return proc.returncode, stdout, stderr
+
 
 class NIPXXValidator:
     """NIP-XX Time Capsules Validator - Strict specification compliance"""
     
     def __init__(self, relay_url="wss://shu01.shugur.net"):
         self.relay_url = relay_url
-        
+
+        # One runner per external tool, created once so the executable
+        # lookup is paid a single time instead of on every operation
+        self._tle = _ToolRunner("tle")
+        self._nak = _ToolRunner("nak")
+
+        # Prefer in-process crypto over shelling out to nak; USE_NAK=1
+        # forces the subprocess path for parity testing
+        self._native_crypto = HAVE_NATIVE_CRYPTO and os.environ.get("USE_NAK") != "1"
+
+        # privkey -> pubkey memo; derivation is deterministic and the same
+        # keys are converted repeatedly during a run
+        self._pubkey_cache = {}
+
+        # Serializes output from concurrently created capsules
+        self._print_lock = threading.Lock()
+
+        # One WebSocket to the relay for the life of the validator; the
+        # lock pairs each send with its recv when capsules post from
+        # concurrent workers
+        self._ws = None
+        self._ws_lock = threading.Lock()
+
+        # One keep-alive session for all drand HTTP calls, so repeated
+        # round polling reuses the TCP+TLS connection instead of paying
+        # a fresh handshake every request
+        self.http = requests.Session()
+        self.http.headers["Connection"] = "keep-alive"
+        self.http.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=4))
+
         # Real drand networks (unchained production networks only)
         self.drand_networks = {
             "quicknet": {
-                "name": "Quicknet", 
+                "name": "Quicknet",
                 "hash": "52db9ba70e0cc0f6eaf7803dd07447a1f5477735fd3f661792ba94600c84e971",
                 "api": "https://api.drand.sh",
                 "period": 3,  # 3 second rounds
                 "description": "Primary unchained drand network"
             }
         }
-    
+
+        # Chain-hash index over the same network dicts for O(1) lookups
+        self._networks_by_hash = {
+            network["hash"]: network for network in self.drand_networks.values()
+        }
+
+    def _log(self, *args):
+        """Print under a lock so concurrent capsule output doesn't interleave"""
+        with self._print_lock:
+            print(*args)
+
+    def _ensure_ws(self):
+        """Lazily open (and then reuse) the relay WebSocket connection"""
+        if self._ws is None:
+            self._ws = websocket.create_connection(
+                self.relay_url, timeout=10, enable_multithread=True
+            )
+        return self._ws
+
+    def close(self):
+        """Release the persistent relay connection"""
+        if self._ws is not None:
+            try:
+                self._ws.close()
+            except Exception:
+                pass
+            self._ws = None
+
     def check_dependencies(self):
         """Verify required tools are available"""
         missing = []
-        
-        for tool in ["tle", "nak"]:
-            try:
-                subprocess.run([tool, "--help"], capture_output=True, timeout=5)
-            except (subprocess.TimeoutExpired, FileNotFoundError):
+
+        # nak is only needed when in-process crypto is unavailable/disabled.
+        # A PATH probe is enough to check existence - no need to exec the
+        # tool just to throw away its help output
+        tools = ["tle"] if self._native_crypto else ["tle", "nak"]
+        for tool in tools:
+            if shutil.which(tool) is None:
                 missing.append(tool)
         
         try:
@@ -69,48 +303,62 @@ class NIPXXValidator:
     def get_current_round(self, chain_hash, api_url):
         """Get current drand round from network"""
         try:
-            response = requests.get(f"{api_url}/{chain_hash}/public/latest", timeout=10)
+            # (connect, read) timeouts: a stalled endpoint should fail in
+            # seconds, not block a whole polling interval
+            response = self.http.get(f"{api_url}/{chain_hash}/public/latest", timeout=(1.5, 3))
             response.raise_for_status()
             data = response.json()
             return int(data["round"])
         except Exception as e:
             raise RuntimeError(f"Failed to get current round: {e}")
 
+    def _ensure_chain_info(self, chain_hash, api_url):
+        """Fetch and cache static chain info (genesis_time, period) once"""
+        network = self._networks_by_hash.get(chain_hash)
+        if network is None:
+            raise RuntimeError(f"Unknown drand chain: {chain_hash}")
+
+        if "genesis_time" not in network:
+            response = self.http.get(f"{api_url}/{chain_hash}/info", timeout=(1.5, 3))
+            response.raise_for_status()
+            info = response.json()
+            network["genesis_time"] = int(info["genesis_time"])
+            network["period"] = int(info.get("period", network["period"]))
+
+        return network
+
     def calculate_target_round(self, unlock_time, chain_hash, api_url):
         """Calculate target round for given unlock time"""
         try:
-            # Get current round and info
-            current_round = self.get_current_round(chain_hash, api_url)
-            
-            # Get network info for period  
-            info_response = requests.get(f"{api_url}/{chain_hash}/info", timeout=10)
-            info_response.raise_for_status()
-            info = info_response.json()
-            period = info.get("period", 3)
-            
-            # Calculate rounds needed
-            current_time = int(time.time())
-            seconds_needed = max(0, unlock_time - current_time)
-            rounds_needed = (seconds_needed + period - 1) // period  # Round up
-            
-            return current_round + rounds_needed
+            # period and genesis_time are static per chain, so the round
+            # covering any wall-clock time is pure arithmetic - the only
+            # network call is the one-time /info fetch
+            network = self._ensure_chain_info(chain_hash, api_url)
+            period = network["period"]
+            genesis_time = network["genesis_time"]
+
+            return max(1, (unlock_time - genesis_time + period - 1) // period + 1)
         except Exception as e:
             raise RuntimeError(f"Failed to calculate target round: {e}")
 
     def tlock_encrypt(self, plaintext, target_round, chain_hash):
         """Encrypt plaintext using tlock with real drand network"""
+        # Accept pre-encoded bytes so callers in a loop encode only once
+        if isinstance(plaintext, str):
+            plaintext = plaintext.encode('utf-8')
+
         try:
             # Use tle for real tlock encryption - binary input/output
-            result = subprocess.run([
-                "tle", "--encrypt",
+            returncode, stdout, stderr = self._tle.run_bytes([
+                "--encrypt",
                 "--chain", chain_hash,
                 "--round", str(target_round)
-            ], input=plaintext.encode('utf-8'), capture_output=True, timeout=30)
-            
-            if result.returncode != 0:
-                raise RuntimeError(f"tlock encryption failed: {result.stderr.decode()}")
-            
-            return result.stdout  # Return binary data
+            ], plaintext)
+
+            if returncode != 0:
+                raise RuntimeError(f"tlock encryption failed: {stderr.decode()}")
+
+            return stdout  # Return binary data
         except Exception as e:
             raise RuntimeError(f"tlock encryption error: {e}")
 
@@ -118,27 +366,56 @@ class NIPXXValidator:
         """Decrypt ciphertext using tlock with real drand network"""
         try:
             # Use tle for real tlock decryption
-            result = subprocess.run([
-                "tle", "--decrypt",
+            returncode, stdout, stderr = self._tle.run_bytes([
+                "--decrypt",
                 "--chain", chain_hash
-            ], input=ciphertext, capture_output=True, timeout=30)
-            
-            if result.returncode != 0:
-                raise RuntimeError(f"tlock decryption failed: {result.stderr.decode()}")
-            
-            return result.stdout.decode('utf-8')
+            ], ciphertext)
+
+            if returncode != 0:
+                raise RuntimeError(f"tlock decryption failed: {stderr.decode()}")
+
+            return stdout.decode('utf-8')
         except Exception as e:
             raise RuntimeError(f"tlock decryption error: {e}")
 
+    def _nip44_conversation_key(self, privkey_hex, pubkey_hex):
+        """Derive the NIP-44 v2 conversation key via ECDH + HKDF-Extract"""
+        pubkey = coincurve.PublicKey(bytes.fromhex("02" + pubkey_hex))
+        shared_x = pubkey.multiply(bytes.fromhex(privkey_hex)).format(compressed=True)[1:]
+        return _hkdf_extract(b"nip44-v2", shared_x)
+
+    def _nip44_message_keys(self, conversation_key, nonce):
+        """Expand per-message ChaCha20 key/nonce and HMAC key"""
+        keys = _hkdf_expand(conversation_key, nonce, 76)
+        return keys[:32], keys[32:44], keys[44:76]
+
+    def _chacha20(self, key, nonce12, data):
+        """ChaCha20 with a zero 4-byte counter prefix (RFC 7539 layout)"""
+        cipher = Cipher(ChaCha20(key, b"\x00" * 4 + nonce12), mode=None)
+        return cipher.encryptor().update(data)
+
     def nip44_encrypt(self, plaintext, sender_privkey, recipient_pubkey):
-        """Encrypt using NIP-44 via nak"""
+        """Encrypt using NIP-44 v2 (in-process, or via nak as fallback)"""
+        if self._native_crypto:
+            conversation_key = self._nip44_conversation_key(sender_privkey, recipient_pubkey)
+            nonce = secrets.token_bytes(32)
+            chacha_key, chacha_nonce, hmac_key = self._nip44_message_keys(conversation_key, nonce)
+
+            plaintext_bytes = plaintext.encode('utf-8')
+            padded = len(plaintext_bytes).to_bytes(2, 'big') + plaintext_bytes
+            padded += b"\x00" * (2 + _nip44_padded_len(len(plaintext_bytes)) - len(padded))
+
+            ciphertext = self._chacha20(chacha_key, chacha_nonce, padded)
+            mac = hmac.new(hmac_key, nonce + ciphertext, hashlib.sha256).digest()
+            return base64.b64encode(b"\x02" + nonce + ciphertext + mac).decode('utf-8')
+
         try:
-            result = subprocess.run([
-                "nak", "encrypt",
+            result = self._nak.run([
+                "encrypt",
                 "--sec", sender_privkey,
                 "--recipient-pubkey", recipient_pubkey,
                 plaintext
-            ], capture_output=True, text=True, timeout=10)
+            ], text=True)
             
             if result.returncode != 0:
                 raise RuntimeError(f"NIP-44 encryption failed: {result.stderr}")
@@ -148,14 +425,31 @@ class NIPXXValidator:
             raise RuntimeError(f"NIP-44 encryption error: {e}")
 
     def nip44_decrypt(self, ciphertext_b64, receiver_privkey, sender_pubkey):
-        """Decrypt using NIP-44 via nak"""
+        """Decrypt using NIP-44 v2 (in-process, or via nak as fallback)"""
+        if self._native_crypto:
+            payload = base64.b64decode(ciphertext_b64)
+            if len(payload) < 99 or payload[0] != 2:
+                raise RuntimeError("NIP-44 decryption failed: invalid payload")
+
+            nonce, ciphertext, mac = payload[1:33], payload[33:-32], payload[-32:]
+            conversation_key = self._nip44_conversation_key(receiver_privkey, sender_pubkey)
+            chacha_key, chacha_nonce, hmac_key = self._nip44_message_keys(conversation_key, nonce)
+
+            expected_mac = hmac.new(hmac_key, nonce + ciphertext, hashlib.sha256).digest()
+            if not hmac.compare_digest(mac, expected_mac):
+                raise RuntimeError("NIP-44 decryption failed: MAC mismatch")
+
+            padded = self._chacha20(chacha_key, chacha_nonce, ciphertext)
+            plaintext_len = int.from_bytes(padded[:2], 'big')
+            return padded[2:2 + plaintext_len].decode('utf-8')
+
         try:
-            result = subprocess.run([
-                "nak", "decrypt", 
+            result = self._nak.run([
+                "decrypt",
                 "--sec", receiver_privkey,
                 "--sender-pubkey", sender_pubkey,
                 ciphertext_b64
-            ], capture_output=True, text=True, timeout=10)
+            ], text=True)
             
             if result.returncode != 0:
                 raise RuntimeError(f"NIP-44 decryption failed: {result.stderr}")
@@ -165,39 +459,61 @@ class NIPXXValidator:
             raise RuntimeError(f"NIP-44 decryption error: {e}")
 
     def privkey_to_pubkey(self, privkey_hex):
-        """Convert private key to public key using nak"""
-        try:
-            result = subprocess.run([
-                "nak", "key", "public", privkey_hex
-            ], capture_output=True, text=True, timeout=10)
-            
-            if result.returncode != 0:
-                raise RuntimeError(f"Key conversion failed: {result.stderr}")
-            
-            return result.stdout.strip()
-        except Exception as e:
-            raise RuntimeError(f"Key conversion error: {e}")
+        """Convert private key to x-only public key (in-process, or via nak)"""
+        # The pubkey is a pure function of the private key, and the same
+        # author/recipient keys come through here several times per run
+        cached = self._pubkey_cache.get(privkey_hex)
+        if cached is not None:
+            return cached
+
+        if self._native_crypto:
+            privkey = coincurve.PrivateKey(bytes.fromhex(privkey_hex))
+            pubkey = privkey.public_key.format(compressed=True)[1:].hex()
+        else:
+            try:
+                result = self._nak.run([
+                    "key", "public", privkey_hex
+                ], text=True)
+
+                if result.returncode != 0:
+                    raise RuntimeError(f"Key conversion failed: {result.stderr}")
+
+                pubkey = result.stdout.strip()
+            except Exception as e:
+                raise RuntimeError(f"Key conversion error: {e}")
+
+        self._pubkey_cache[privkey_hex] = pubkey
+        return pubkey
 
     def calculate_event_id(self, event):
-        """Calculate event ID according to NIP-01"""
-        serialized = json.dumps([
+        """Calculate event ID for an Event according to NIP-01"""
+        serialized = _json_dumps([
             0,  # Reserved
-            event["pubkey"], 
-            event["created_at"],
-            event["kind"],
-            event["tags"],
-            event["content"]
-        ], separators=(',', ':'), ensure_ascii=False)
-        
-        return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+            event.pubkey,
+            event.created_at,
+            event.kind,
+            event.tags,
+            event.content
+        ])
+
+        return _sha256(serialized).hexdigest()
 
     def sign_event(self, event, privkey_hex):
-        """Sign event using nak"""
+        """Sign an Event with BIP-340 schnorr (in-process, or via nak).
+
+        Returns the signed event in wire-format dict form.
+        """
+        if self._native_crypto:
+            event.id = self.calculate_event_id(event)
+            privkey = coincurve.PrivateKey(bytes.fromhex(privkey_hex))
+            event.sig = privkey.sign_schnorr(bytes.fromhex(event.id)).hex()
+            return event.to_dict()
+
         try:
-            event_json = json.dumps(event, separators=(',', ':'), ensure_ascii=False)
-            result = subprocess.run([
-                "nak", "event", "--sec", privkey_hex
-            ], input=event_json, text=True, capture_output=True, timeout=10)
+            event_json = _json_dumps(event.to_dict()).decode('utf-8')
+            result = self._nak.run([
+                "event", "--sec", privkey_hex
+            ], input=event_json, text=True)
             
             if result.returncode != 0:
                 raise RuntimeError(f"Event signing failed: {result.stderr}")
@@ -208,141 +524,183 @@ class NIPXXValidator:
 
     def create_public_capsule(self, message, target_round, author_privkey, chain_hash):
         """Create public time capsule (kind 1041) per NIP-XX specification"""
-        import base64
         
-        print(f"📝 Creating public capsule...")
-        print(f"   Message: {message}")
-        print(f"   Target round: {target_round}")
-        print(f"   Chain: {chain_hash[:8]}...")
+        self._log(f"📝 Creating public capsule...")
+        self._log(f"   Message: {message}")
+        self._log(f"   Target round: {target_round}")
+        self._log(f"   Chain: {chain_hash[:8]}...")
         
         # Step 1: Encrypt with tlock (real drand network)
         tlock_blob = self.tlock_encrypt(message, target_round, chain_hash)
-        print(f"   Encrypted blob size: {len(tlock_blob)} bytes")
+        self._log(f"   Encrypted blob size: {len(tlock_blob)} bytes")
         
         # Step 2: Create event per NIP-XX specification
-        event = {
-            "kind": 1041,
-            "content": base64.b64encode(tlock_blob).decode('utf-8'),  # Direct age v1 binary
-            "tags": [
+        event = Event(
+            kind=1041,
+            content=base64.b64encode(tlock_blob).decode('utf-8'),  # Direct age v1 binary
+            tags=[
                 ["tlock", chain_hash, str(target_round)],  # 3-element format
-                ["alt", "NIP-XX public time capsule"] 
+                ["alt", "NIP-XX public time capsule"]
             ],
-            "created_at": int(time.time()),
-            "pubkey": self.privkey_to_pubkey(author_privkey)
-        }
+            created_at=int(time.time()),
+            pubkey=self.privkey_to_pubkey(author_privkey)
+        )
         
         # Step 3: Sign event
         signed_event = self.sign_event(event, author_privkey)
-        print(f"   Event ID: {signed_event['id']}")
+        self._log(f"   Event ID: {signed_event['id']}")
         
         return signed_event
 
     def create_private_capsule(self, message, target_round, author_privkey, recipient_pubkey, chain_hash):
         """Create private time capsule using NIP-59 gift wrapping per NIP-XX specification"""
-        import base64
-        
-        print(f"🔒 Creating private capsule...")
-        print(f"   Message: {message}")
-        print(f"   Target round: {target_round}")
-        print(f"   Recipient: {recipient_pubkey[:16]}...")
         
+        self._log(f"🔒 Creating private capsule...")
+        self._log(f"   Message: {message}")
+        self._log(f"   Target round: {target_round}")
+        self._log(f"   Recipient: {recipient_pubkey[:16]}...")
+        
+        # One clock read for the whole bundle.  Per NIP-59 the seal and
+        # gift wrap get timestamps tweaked to a random point in the past
+        # two days so the wrap doesn't leak when the rumor was created.
+        now = int(time.time())
+        seal_ts = now - secrets.randbelow(172800)
+        wrap_ts = now - secrets.randbelow(172800)
+
         # Step 1: Create rumor (unsigned kind 1041)
         tlock_blob = self.tlock_encrypt(message, target_round, chain_hash)
-        rumor = {
-            "kind": 1041,
-            "content": base64.b64encode(tlock_blob).decode('utf-8'),
-            "tags": [
+        rumor = Event(
+            kind=1041,
+            content=base64.b64encode(tlock_blob).decode('utf-8'),
+            tags=[
                 ["tlock", chain_hash, str(target_round)],
                 ["alt", "NIP-XX private time capsule rumor"]
             ],
-            "created_at": int(time.time()),
-            "pubkey": self.privkey_to_pubkey(author_privkey)
-        }
-        rumor["id"] = self.calculate_event_id(rumor)
-        
+            created_at=now,
+            pubkey=self.privkey_to_pubkey(author_privkey)
+        )
+        rumor.id = self.calculate_event_id(rumor)
+
         # Step 2: Create seal (kind 13) - encrypt rumor with NIP-44
-        rumor_json = json.dumps(rumor, separators=(',', ':'), ensure_ascii=False)
+        rumor_json = _json_dumps(rumor.to_dict()).decode('utf-8')
         seal_content = self.nip44_encrypt(rumor_json, author_privkey, recipient_pubkey)
-        
-        seal = {
-            "kind": 13,
-            "content": seal_content,
-            "tags": [],  # Must be empty per NIP-59
-            "created_at": int(time.time()),
-            "pubkey": self.privkey_to_pubkey(author_privkey)
-        }
+
+        seal = Event(
+            kind=13,
+            content=seal_content,
+            tags=[],  # Must be empty per NIP-59
+            created_at=seal_ts,
+            pubkey=self.privkey_to_pubkey(author_privkey)
+        )
         signed_seal = self.sign_event(seal, author_privkey)
         
         # Step 3: Create gift wrap (kind 1059) - encrypt seal with ephemeral key
         ephemeral_privkey = secrets.token_hex(32)
         ephemeral_pubkey = self.privkey_to_pubkey(ephemeral_privkey)
         
-        seal_json = json.dumps(signed_seal, separators=(',', ':'), ensure_ascii=False)
+        seal_json = _json_dumps(signed_seal).decode('utf-8')
         gift_wrap_content = self.nip44_encrypt(seal_json, ephemeral_privkey, recipient_pubkey)
         
-        gift_wrap = {
-            "kind": 1059,
-            "content": gift_wrap_content,
-            "tags": [["p", recipient_pubkey]],  # Routing tag
-            "created_at": int(time.time()),
-            "pubkey": ephemeral_pubkey
-        }
+        gift_wrap = Event(
+            kind=1059,
+            content=gift_wrap_content,
+            tags=[["p", recipient_pubkey]],  # Routing tag
+            created_at=wrap_ts,
+            pubkey=ephemeral_pubkey
+        )
         
         signed_gift_wrap = self.sign_event(gift_wrap, ephemeral_privkey)
-        print(f"   Gift wrap ID: {signed_gift_wrap['id']}")
+        self._log(f"   Gift wrap ID: {signed_gift_wrap['id']}")
         
         return signed_gift_wrap, author_privkey  # Return author key for later decryption
 
-    def post_to_relay(self, event):
-        """Post event to relay and return success status"""
+    def post_batch(self, events):
+        """Post events to the relay pipelined: send every EVENT frame
+        back-to-back, then collect the OKs.  NIP-01 keys OKs by event id,
+        so the sends don't need to wait for each other's round trip.
+
+        Returns a dict mapping event id to acceptance status.
+        """
+        results = {event["id"]: False for event in events}
+
         try:
-            ws = websocket.create_connection(self.relay_url, timeout=10)
-            req = json.dumps(["EVENT", event])
-            ws.send(req)
-            
-            response = ws.recv()
-            result = json.loads(response)
-            ws.close()
-            
-            if result[0] == "OK" and result[2]:
-                print(f"   ✅ Posted to relay: {event['id'][:16]}...")
-                return True
-            else:
-                error_msg = result[3] if len(result) > 3 else "Unknown error"
-                print(f"   ❌ Rejected by relay: {error_msg}")
-                return False
-                
+            with self._ws_lock:
+                ws = self._ensure_ws()
+                for event in events:
+                    ws.send(_json_dumps(["EVENT", event]).decode('utf-8'))
+
+                # OKs may arrive in any order; match them by event id
+                pending = set(results)
+                while pending:
+                    result = json.loads(ws.recv())
+                    if result[0] != "OK" or result[1] not in pending:
+                        continue
+
+                    event_id = result[1]
+                    pending.discard(event_id)
+
+                    if result[2]:
+                        results[event_id] = True
+                        self._log(f"   ✅ Posted to relay: {event_id[:16]}...")
+                    else:
+                        error_msg = result[3] if len(result) > 3 else "Unknown error"
+                        self._log(f"   ❌ Rejected by relay: {error_msg}")
+
         except Exception as e:
-            print(f"   ❌ Relay error: {e}")
-            return False
+            # Drop the connection so the next post reconnects cleanly
+            self.close()
+            self._log(f"   ❌ Relay error: {e}")
+
+        return results
+
+    def post_to_relay(self, event):
+        """Post a single event to relay and return success status"""
+        return self.post_batch([event])[event["id"]]
 
     def wait_for_unlock(self, target_round, chain_hash, api_url, network_name):
         """Wait for drand round to be reached"""
         print(f"⏳ Waiting for {network_name} round {target_round}...")
         
         start_time = time.time()
+        backoff = 0.5
         while True:
             try:
+                # Rounds land on a fixed schedule (round 1 at genesis_time,
+                # one every period seconds), so sleep straight to the target
+                # round's publication time instead of polling blindly; the
+                # 0.5s buffer covers beacon publication jitter
+                network = self._ensure_chain_info(chain_hash, api_url)
+                period = network["period"]
+                target_time = network["genesis_time"] + (target_round - 1) * period + 0.5
+
+                sleep_for = target_time - time.time()
+                if sleep_for > 0:
+                    print(f"   💤 Sleeping {sleep_for:.1f}s until round boundary")
+                    time.sleep(sleep_for)
+
                 current_round = self.get_current_round(chain_hash, api_url)
-                
+                backoff = 0.5  # healthy again, reset the error backoff
+
                 if current_round >= target_round:
                     elapsed = time.time() - start_time
                     print(f"   ✅ Round {target_round} reached! (waited {elapsed:.1f}s)")
                     return True
-                
+
                 remaining = target_round - current_round
                 print(f"   ⏰ Round {current_round}/{target_round} ({remaining} rounds remaining)")
-                
-                # Wait for next round (with some buffer)
-                time.sleep(5)
-                
+
+                # Beacon is late; re-check after one period
+                time.sleep(period)
+
             except Exception as e:
-                print(f"   ⚠️ Error checking round: {e}")
-                time.sleep(10)
+                # Exponential backoff on transient failures: retry fast
+                # first, then ease off up to 10s
+                print(f"   ⚠️ Error checking round: {e} (retrying in {backoff:.1f}s)")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 10)
 
     def decrypt_public_capsule(self, event, chain_hash, api_url):
         """Decrypt public time capsule"""
-        import base64
         
         print(f"🔓 Decrypting public capsule {event['id'][:16]}...")
         
@@ -370,35 +728,83 @@ class NIPXXValidator:
         rumor_event = json.loads(rumor_json)
         
         # Step 3: Extract tlock parameters and decrypt
-        tlock_tag = None
-        for tag in rumor_event["tags"]:
-            if tag[0] == "tlock":
-                tlock_tag = tag
-                break
-        
+        tags_by_name = {tag[0]: tag for tag in rumor_event["tags"]}
+        tlock_tag = tags_by_name.get("tlock")
+
         if not tlock_tag or len(tlock_tag) != 3:
             raise ValueError("Invalid tlock tag in rumor")
-        
+
         chain_hash = tlock_tag[1]
-        
-        # Find API for this chain
-        api_url = None
-        for network in self.drand_networks.values():
-            if network["hash"] == chain_hash:
-                api_url = network["api"] 
-                break
-        
-        if not api_url:
+
+        # Make sure the chain is one we know
+        if chain_hash not in self._networks_by_hash:
             raise ValueError(f"Unknown drand chain: {chain_hash}")
-        
+
+
         # Decrypt the time capsule content
-        import base64
         tlock_blob = base64.b64decode(rumor_event["content"])
         decrypted = self.tlock_decrypt(tlock_blob, chain_hash)
         
         print(f"   ✅ Decrypted: {decrypted}")
         return decrypted
 
+    async def _create_and_post_capsules(self, target_round, author_privkey,
+                                        recipient_privkey, recipient_pubkey,
+                                        chain_hash, api_url):
+        """Build both capsules concurrently and post them pipelined.
+
+        The validator is I/O-bound: tle subprocess pipes, signing, and
+        the relay socket.  The blocking pieces run on worker threads via
+        asyncio.to_thread while the event loop overlaps their waits, and
+        being awaitable lets future callers compose this with other
+        async work (round polling, extra relays).
+
+        Returns (public_capsules, private_capsules) tuple lists in the
+        layout the decrypt phase expects.
+        """
+        public_result, private_result = await asyncio.gather(
+            asyncio.to_thread(
+                self.create_public_capsule,
+                "Hello from public time capsule! 🕐",
+                target_round,
+                author_privkey,
+                chain_hash
+            ),
+            asyncio.to_thread(
+                self.create_private_capsule,
+                "Secret message in private capsule! 🔒",
+                target_round,
+                author_privkey,
+                recipient_pubkey,
+                chain_hash
+            ),
+            return_exceptions=True
+        )
+
+        if isinstance(public_result, BaseException):
+            raise RuntimeError(f"public capsule: {public_result}")
+        if isinstance(private_result, BaseException):
+            raise RuntimeError(f"private capsule: {private_result}")
+
+        public_event = public_result
+        private_event, author_key = private_result
+
+        # Both EVENTs go out back-to-back on the persistent socket
+        post_results = await asyncio.to_thread(
+            self.post_batch, [public_event, private_event]
+        )
+
+        public_capsules = []   # (event, chain_hash, api_url)
+        private_capsules = []  # (event, author_privkey, recipient_privkey)
+
+        if post_results[public_event["id"]]:
+            public_capsules.append((public_event, chain_hash, api_url))
+
+        if post_results[private_event["id"]]:
+            private_capsules.append((private_event, author_key, recipient_privkey))
+
+        return public_capsules, private_capsules
+
     def run_validation(self):
         """Run complete NIP-XX validation with real drand and encryption"""
         print("🕐 NIP-XX Time Capsules Validation")
@@ -453,59 +859,32 @@ class NIPXXValidator:
             print(f"❌ Failed to setup timing: {e}")
             return False
         
-        # Create capsules
-        created_events = []
-        
-        # 1. Create public capsule
-        try:
-            public_event = self.create_public_capsule(
-                "Hello from public time capsule! 🕐",
-                target_round, 
-                author_privkey,
-                chain_hash
-            )
-            
-            if self.post_to_relay(public_event):
-                created_events.append({
-                    "type": "public", 
-                    "event": public_event,
-                    "chain_hash": chain_hash,
-                    "api_url": api_url
-                })
-            print()
-            
-        except Exception as e:
-            print(f"❌ Public capsule creation failed: {e}")
-            return False
-        
-        # 2. Create private capsule  
+        # Create capsules - public and private are independent, so their
+        # tlock encryption, signing, and relay POSTs run concurrently on
+        # the asyncio loop.  Results land in per-type tuple lists so the
+        # decrypt phase runs two tight loops with no per-item dispatch
         try:
-            private_event, author_key = self.create_private_capsule(
-                "Secret message in private capsule! 🔒",
-                target_round,
-                author_privkey,
-                recipient_pubkey, 
-                chain_hash
+            public_capsules, private_capsules = asyncio.run(
+                self._create_and_post_capsules(
+                    target_round,
+                    author_privkey,
+                    recipient_privkey,
+                    recipient_pubkey,
+                    chain_hash,
+                    api_url
+                )
             )
-            
-            if self.post_to_relay(private_event):
-                created_events.append({
-                    "type": "private",
-                    "event": private_event, 
-                    "author_privkey": author_key,
-                    "recipient_privkey": recipient_privkey
-                })
-            print()
-            
         except Exception as e:
-            print(f"❌ Private capsule creation failed: {e}")
+            print(f"❌ Capsule creation failed: {e}")
             return False
-        
-        if not created_events:
+        print()
+
+        total_created = len(public_capsules) + len(private_capsules)
+        if total_created == 0:
             print("❌ No events were successfully created")
             return False
-        
-        print(f"📊 Created {len(created_events)} time capsules")
+
+        print(f"📊 Created {total_created} time capsules")
         print()
         
         # Wait for timelock expiration
@@ -515,39 +894,33 @@ class NIPXXValidator:
         # Decrypt capsules
         print("🔓 Decrypting time capsules...")
         success_count = 0
-        
-        for item in created_events:
+
+        for event, capsule_chain, capsule_api in public_capsules:
             try:
-                if item["type"] == "public":
-                    decrypted = self.decrypt_public_capsule(
-                        item["event"],
-                        item["chain_hash"], 
-                        item["api_url"]
-                    )
-                else:  # private
-                    decrypted = self.decrypt_private_capsule(
-                        item["event"],
-                        item["author_privkey"],
-                        item["recipient_privkey"]
-                    )
-                
+                self.decrypt_public_capsule(event, capsule_chain, capsule_api)
                 success_count += 1
-                
             except Exception as e:
                 print(f"   ❌ Decryption failed: {e}")
-        
+
+        for event, capsule_author_key, capsule_recipient_key in private_capsules:
+            try:
+                self.decrypt_private_capsule(event, capsule_author_key, capsule_recipient_key)
+                success_count += 1
+            except Exception as e:
+                print(f"   ❌ Decryption failed: {e}")
+
         print()
         
         # Final results
         print("=" * 50)
         print("🎉 NIP-XX Validation Results:")
-        print(f"   ✅ Created: {len(created_events)}/2 capsules")
-        print(f"   ✅ Decrypted: {success_count}/{len(created_events)} capsules")
+        print(f"   ✅ Created: {total_created}/2 capsules")
+        print(f"   ✅ Decrypted: {success_count}/{total_created} capsules")
         print(f"   ✅ Real drand network: {network_name}")
         print(f"   ✅ Real tlock encryption: age v1 + drand")
         print(f"   ✅ Real NIP-44 encryption: for private capsules")
         
-        success = success_count == len(created_events) == 2
+        success = success_count == total_created == 2
         
         if success:
             print("🏆 ALL VALIDATIONS PASSED!")
@@ -571,6 +944,8 @@ def main():
     except Exception as e:
         print(f"\n💥 Unexpected error: {e}")
         sys.exit(1)
+    finally:
+        validator.close()
 
 
 if __name__ == "__main__":